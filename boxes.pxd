@@ -0,0 +1,43 @@
+# Optional Cython annotations for boxes.py, used only when compiling it
+# (see the Install section of the README). Plain Python ignores this file.
+#
+# Only loop indices are typed: they're bounded by 32-bit entry counts, while
+# accumulated values (times, offsets) may overflow and stay Python ints.
+
+cimport cython
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_elst_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_sidx_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_stts_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_ctts_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_stsc_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_stsz_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_stss_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_sbgp_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_saiz_box(ps)
+
+@cython.locals(i=Py_ssize_t)
+cpdef parse_saio_box(ps)
+
+@cython.locals(s_idx=Py_ssize_t)
+cpdef parse_trun_box(ps)
+
+@cython.locals(s_idx=Py_ssize_t)
+cpdef parse_senc_box(ps)
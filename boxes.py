@@ -2,13 +2,16 @@
 Handlers for each box
 '''
 
-from typing import List
+import operator
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from mp4parser import \
 	Parser, max_dump, max_rows, mask, print_hex_dump, args, \
+	show_lengths, show_nalu_data, \
 	format_time, format_size, format_fraction, decode_language, \
 	parse_boxes, parse_fullbox, \
-	ansi_bold, ansi_dim, ansi_fg1, ansi_fg2
+	ansi_bold, ansi_dim, ansi_fg1, ansi_fg2, ansi_fg4
 from parser_tables import \
 	protection_systems, qtff_well_known_types, iso_369_2t_lang_codes
 import descriptors
@@ -16,7 +19,9 @@ import descriptors
 
 def parse_skip_box(ps: Parser):
 	data = ps.read()
-	if any(bytes(data)):
+	# look for non-zero bytes a chunk at a time, so we don't copy (and fault in) the whole payload at once
+	chunks = (data[i:i + (1 << 16)].tobytes() for i in range(0, len(data), 1 << 16))
+	if any(c.count(0) != len(c) for c in chunks):
 		print_hex_dump(data, ps.prefix)
 	else:
 		ps.print(ansi_dim(ansi_fg2(f'({len(data)} empty bytes)')))
@@ -40,7 +45,7 @@ def parse_hdlr_box(ps: Parser):
 	ps.reserved('pre_defined', ps.bytes(4))
 	handler_type = ps.fourcc()
 	ps.reserved('reserved', ps.bytes(4 * 3))
-	name = ps.bytes().decode('utf-8')
+	name = str(ps.read(), 'utf-8')
 	ps.print(f'handler_type = {repr(handler_type)}, name = {repr(name)}')
 
 	global last_handler_seen
@@ -340,95 +345,104 @@ def parse_sgpd_box(ps: Parser):
 
 # CODEC-SPECIFIC BOXES
 
+def parse_nalu(ps: Parser, label: str, dump_indent: Optional[str] = None):
+	''' read a 16-bit length prefixed NALU; if dump_indent is given, data is hex-dumped below the label with that indent '''
+	if show_nalu_data and dump_indent is not None:
+		ps.print(label)
+		print_hex_dump(ps.read(ps.int(2)), ps.prefix + dump_indent)
+		return
+	nalu = ps.read(ps.int(2))
+	if show_nalu_data:
+		ps.print(f'{label}: {nalu.hex()}')
+	else:
+		ps.print(label + (ansi_fg4(f' ({len(nalu)})') if show_lengths else ''))
+
 def parse_avcC_box(ps: Parser):
-	if (configurationVersion := ps.int(1)) != 1:
+	configurationVersion, profile_compat_level, composite_1, composite_2 = ps.unpack('B3sBB')
+	if configurationVersion != 1:
 		raise AssertionError(f'invalid configuration version: {configurationVersion}')
-	ps.field('profile / compat / level', ps.bytes(3).hex(), str)
-	with ps.bits(1) as br:
-		ps.reserved('reserved_1', br.read(6), mask(6))
-		ps.field('lengthSizeMinusOne', br.read(2))
-
-	with ps.bits(1) as br:
-		ps.reserved('reserved_2', br.read(3), mask(3))
-		numOfSequenceParameterSets = br.read(5)
+	ps.field('profile / compat / level', profile_compat_level.hex(), str)
+	ps.reserved('reserved_1', composite_1 >> 2, mask(6))
+	ps.field('lengthSizeMinusOne', composite_1 & mask(2))
+
+	ps.reserved('reserved_2', composite_2 >> 5, mask(3))
+	numOfSequenceParameterSets = composite_2 & mask(5)
 	for i in range(numOfSequenceParameterSets):
-		ps.print(f'- SPS: {ps.bytes(ps.int(2)).hex()}')
+		parse_nalu(ps, '- SPS')
 	numOfPictureParameterSets = ps.int(1)
 	for i in range(numOfPictureParameterSets):
-		ps.print(f'- PPS: {ps.bytes(ps.int(2)).hex()}')
+		parse_nalu(ps, '- PPS')
 
 	# FIXME: parse extensions
 
 def parse_svcC_box(ps: Parser):
-	if (configurationVersion := ps.int(1)) != 1:
+	configurationVersion, profile_compat_level, composite_1, composite_2 = ps.unpack('B3sBB')
+	if configurationVersion != 1:
 		raise AssertionError(f'invalid configuration version: {configurationVersion}')
-	ps.field('profile / compat / level', ps.bytes(3).hex(), str)
-	with ps.bits(1) as br:
-		ps.field('complete_represenation', br.bit())
-		ps.reserved('reserved_1', br.read(5), mask(5))
-		ps.field('lengthSizeMinusOne', br.read(2))
-
-	with ps.bits(1) as br:
-		ps.reserved('reserved_2', br.read(1), 0)
-		numOfSequenceParameterSets = br.read(7)
+	ps.field('profile / compat / level', profile_compat_level.hex(), str)
+	ps.field('complete_represenation', bool(composite_1 >> 7))
+	ps.reserved('reserved_1', (composite_1 >> 2) & mask(5), mask(5))
+	ps.field('lengthSizeMinusOne', composite_1 & mask(2))
+
+	ps.reserved('reserved_2', composite_2 >> 7, 0)
+	numOfSequenceParameterSets = composite_2 & mask(7)
 	for i in range(numOfSequenceParameterSets):
-		ps.print(f'- SPS: {ps.bytes(ps.int(2)).hex()}')
+		parse_nalu(ps, '- SPS')
 	numOfPictureParameterSets = ps.int(1)
 	for i in range(numOfPictureParameterSets):
-		ps.print(f'- PPS: {ps.bytes(ps.int(2)).hex()}')
+		parse_nalu(ps, '- PPS')
 
 def parse_hvcC_box(ps: Parser):
 	if (configurationVersion := ps.int(1)) != 1:
 		raise AssertionError(f'invalid configuration version: {configurationVersion}')
 
-	with ps.bits(1) as br:
-		ps.field('general_profile_space', br.read(2))
-		ps.field('general_tier_flag', br.read(1))
-		ps.field('general_profile_idc', br.read(5), '02x')
+	composite_1 = ps.int(1)
+	ps.field('general_profile_space', composite_1 >> 6)
+	ps.field('general_tier_flag', (composite_1 >> 5) & 1)
+	ps.field('general_profile_idc', composite_1 & mask(5), '02x')
 	ps.field('general_profile_compatibility_flags', ps.bytes(4).hex(), str)
 	ps.field('general_constraint_indicator_flags', ps.bytes(6).hex(), str)
 	ps.field('general_level_idc', ps.bytes(1).hex(), str)
 
-	with ps.bits(2) as br:
-		ps.reserved('reserved', br.read(4), mask(4))
-		ps.field('min_spatial_segmentation_idc', br.read())
-	with ps.bits(1) as br:
-		ps.reserved('reserved', br.read(6), mask(6))
-		ps.field('parallelismType', br.read())
-	with ps.bits(1) as br:
-		ps.reserved('reserved', br.read(6), mask(6))
-		ps.field('chromaFormat', br.read())
-	with ps.bits(1) as br:
-		ps.reserved('reserved', br.read(5), mask(5))
-		ps.field('bitDepthLumaMinus8', br.read())
-	with ps.bits(1) as br:
-		ps.reserved('reserved', br.read(5), mask(5))
-		ps.field('bitDepthChromaMinus8', br.read())
+	composite_2 = ps.int(2)
+	ps.reserved('reserved', composite_2 >> 12, mask(4))
+	ps.field('min_spatial_segmentation_idc', composite_2 & mask(12))
+	composite_3 = ps.int(1)
+	ps.reserved('reserved', composite_3 >> 2, mask(6))
+	ps.field('parallelismType', composite_3 & mask(2))
+	composite_4 = ps.int(1)
+	ps.reserved('reserved', composite_4 >> 2, mask(6))
+	ps.field('chromaFormat', composite_4 & mask(2))
+	composite_5 = ps.int(1)
+	ps.reserved('reserved', composite_5 >> 3, mask(5))
+	ps.field('bitDepthLumaMinus8', composite_5 & mask(3))
+	composite_6 = ps.int(1)
+	ps.reserved('reserved', composite_6 >> 3, mask(5))
+	ps.field('bitDepthChromaMinus8', composite_6 & mask(3))
 
 	ps.field('avgFrameRate', ps.int(2))
-	with ps.bits(1) as br:
-		ps.field('constantFrameRate', br.read(2))
-		ps.field('numTemporalLayers', br.read(3))
-		ps.field('temporalIdNested', br.bit())
-		ps.field('lengthSizeMinusOne', br.read(2))
+	composite_7 = ps.int(1)
+	ps.field('constantFrameRate', composite_7 >> 6)
+	ps.field('numTemporalLayers', (composite_7 >> 3) & mask(3))
+	ps.field('temporalIdNested', bool((composite_7 >> 2) & 1))
+	ps.field('lengthSizeMinusOne', composite_7 & mask(2))
 
 	numOfArrays = ps.int(1)
 	#ps.field('numOfArrays', numOfArrays)
 	for i in range(numOfArrays):
 		ps.print(f'- array {i}:')
 
-		with ps.bits(1) as br:
-			array_completeness = br.bit()
-			ps.print(f'    array_completeness = {bool(array_completeness)}')
-			ps.reserved('reserved', br.read(1), 0)
-			NAL_unit_type = br.read(6)
-			ps.print(f'    NAL_unit_type = {NAL_unit_type}')
+		composite = ps.int(1)
+		array_completeness = composite >> 7
+		ps.print(f'    array_completeness = {bool(array_completeness)}')
+		ps.reserved('reserved', (composite >> 6) & 1, 0)
+		NAL_unit_type = composite & mask(6)
+		ps.print(f'    NAL_unit_type = {NAL_unit_type}')
 
 		numNalus = ps.int(2)
 		#ps.print(f'    numNalus = {numNalus}')
 		for n in range(numNalus):
-			ps.print(f'    - NALU {n}')
-			print_hex_dump(ps.read(ps.int(2)), ps.prefix + '        ')
+			parse_nalu(ps, f'    - NALU {n}', '        ')
 
 def parse_av1C_box(ps: Parser):
 	with ps.bits(4) as br:
@@ -489,13 +503,11 @@ def parse_elst_box(ps: Parser):
 
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		segment_duration = ps.int(wsize)
-		media_time = ps.sint(wsize)
-		media_rate = ps.sfixed16()
-		if i < max_rows:
-			ps.print(f'[edit segment {i:3}] duration = {segment_duration:6}, media_time = {media_time:6}, media_rate = {media_rate}')
+	for i, (segment_duration, media_time, media_rate) in enumerate(ps.iter_unpack(['Iii', 'Qqi'][version], min(entry_count, max_rows))):
+		media_rate /= 1 << 16
+		ps.print(f'[edit segment {i:3}] duration = {segment_duration:6}, media_time = {media_time:6}, media_rate = {media_rate}')
 	if entry_count > max_rows:
+		ps.read((entry_count - max_rows) * (2 * wsize + 4)) # not shown, so no need to decode them
 		ps.print('...')
 
 def parse_sidx_box(ps: Parser):
@@ -508,18 +520,12 @@ def parse_sidx_box(ps: Parser):
 	ps.field('first_offset', ps.int(wsize))
 	ps.reserved('reserved_1', ps.int(2))
 	ps.field('reference_count', reference_count := ps.int(2))
-	for i in range(reference_count):
-		with ps.bits(4) as br:
-			reference_type = br.read(1)
-			referenced_size = br.read(31)
-		subsegment_duration = ps.int(4)
-		with ps.bits(4) as br:
-			starts_with_SAP = br.read(1)
-			SAP_type = br.read(3)
-			SAP_delta_time = br.read(28)
-		if i < max_rows:
-			ps.print(f'[reference {i:3}] type = {reference_type}, size = {referenced_size}, duration = {subsegment_duration}, starts_with_SAP = {starts_with_SAP}, SAP_type = {SAP_type}, SAP_delta_time = {SAP_delta_time}')
+	for i, (reference, subsegment_duration, SAP) in enumerate(ps.iter_unpack('III', min(reference_count, max_rows))):
+		reference_type, referenced_size = reference >> 31, reference & mask(31)
+		starts_with_SAP, SAP_type, SAP_delta_time = SAP >> 31, (SAP >> 28) & mask(3), SAP & mask(28)
+		ps.print(f'[reference {i:3}] type = {reference_type}, size = {referenced_size}, duration = {subsegment_duration}, starts_with_SAP = {starts_with_SAP}, SAP_type = {SAP_type}, SAP_delta_time = {SAP_delta_time}')
 	if reference_count > max_rows:
+		ps.read((reference_count - max_rows) * 12) # not shown, so no need to decode them
 		ps.print('...')
 
 def parse_stts_box(ps: Parser):
@@ -528,14 +534,15 @@ def parse_stts_box(ps: Parser):
 	sample, time = 1, 0
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		sample_count = ps.int(4)
-		sample_delta = ps.int(4)
-		if i < max_rows:
-			ps.print(f'[entry {i:3}] [sample = {sample:6}, time = {time:6}] sample_count = {sample_count:5}, sample_delta = {sample_delta:5}')
+	for i, (sample_count, sample_delta) in enumerate(ps.iter_unpack('II', min(entry_count, max_rows))):
+		ps.print(f'[entry {i:3}] [sample = {sample:6}, time = {time:6}] sample_count = {sample_count:5}, sample_delta = {sample_delta:5}')
 		sample += sample_count
 		time += sample_count * sample_delta
 	if entry_count > max_rows:
+		# not shown, we only need their totals
+		rest = ps.int_array(4, (entry_count - max_rows) * 2)
+		sample += sum(rest[0::2])
+		time += sum(map(operator.mul, rest[0::2], rest[1::2]))
 		ps.print('...')
 	ps.print(f'[samples = {sample-1:6}, time = {time:6}]')
 
@@ -545,13 +552,12 @@ def parse_ctts_box(ps: Parser):
 	sample = 1
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		sample_count = ps.int(4)
-		sample_offset = [ps.sint, ps.int][version](4)
-		if i < max_rows:
-			ps.print(f'[entry {i:3}] [sample = {sample:6}] sample_count = {sample_count:5}, sample_offset = {sample_offset:5}')
+	for i, (sample_count, sample_offset) in enumerate(ps.iter_unpack('I' + ['i', 'I'][version], min(entry_count, max_rows))):
+		ps.print(f'[entry {i:3}] [sample = {sample:6}] sample_count = {sample_count:5}, sample_offset = {sample_offset:5}')
 		sample += sample_count
 	if entry_count > max_rows:
+		# not shown, we only need their totals
+		sample += sum(ps.int_array(4, (entry_count - max_rows) * 2)[0::2])
 		ps.print('...')
 	ps.print(f'[samples = {sample-1:6}]')
 
@@ -561,10 +567,7 @@ def parse_stsc_box(ps: Parser):
 	sample, last = 1, None
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		first_chunk = ps.int(4)
-		samples_per_chunk = ps.int(4)
-		sample_description_index = ps.int(4)
+	for i, (first_chunk, samples_per_chunk, sample_description_index) in enumerate(ps.iter_unpack('III', entry_count)):
 		if last != None:
 			last_chunk, last_spc = last
 			assert first_chunk > last_chunk
@@ -581,11 +584,11 @@ def parse_stsz_box(ps: Parser):
 	ps.field('sample_size', sample_size := ps.int(4), default=0)
 	ps.field('sample_count', sample_count := ps.int(4))
 	if sample_size == 0:
-		for i in range(sample_count):
+		for i in range(min(sample_count, max_rows)):
 			sample_size = ps.int(4)
-			if i < max_rows:
-				ps.print(f'[sample {i+1:6}] sample_size = {sample_size:5}')
+			ps.print(f'[sample {i+1:6}] sample_size = {sample_size:5}')
 		if sample_count > max_rows:
+			ps.read((sample_count - max_rows) * 4) # not shown, so no need to decode them
 			ps.print('...')
 
 def parse_stco_box(ps: Parser):
@@ -593,11 +596,10 @@ def parse_stco_box(ps: Parser):
 
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		chunk_offset = ps.int(4)
-		if i < max_rows:
-			ps.print(f'[chunk {i+1:5}] offset = {chunk_offset:#08x}')
+	for i, (chunk_offset,) in enumerate(ps.iter_unpack('I', min(entry_count, max_rows))):
+		ps.print(f'[chunk {i+1:5}] offset = {chunk_offset:#08x}')
 	if entry_count > max_rows:
+		ps.read((entry_count - max_rows) * 4) # not shown, so no need to decode them
 		ps.print('...')
 
 def parse_co64_box(ps: Parser):
@@ -605,11 +607,10 @@ def parse_co64_box(ps: Parser):
 
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		chunk_offset = ps.int(8)
-		if i < max_rows:
-			ps.print(f'[chunk {i+1:5}] offset = {chunk_offset:#016x}')
+	for i, (chunk_offset,) in enumerate(ps.iter_unpack('Q', min(entry_count, max_rows))):
+		ps.print(f'[chunk {i+1:5}] offset = {chunk_offset:#016x}')
 	if entry_count > max_rows:
+		ps.read((entry_count - max_rows) * 8) # not shown, so no need to decode them
 		ps.print('...')
 
 def parse_stss_box(ps: Parser):
@@ -617,11 +618,10 @@ def parse_stss_box(ps: Parser):
 
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		sample_number = ps.int(4)
-		if i < max_rows:
-			ps.print(f'[sync sample {i:5}] sample_number = {sample_number:6}')
+	for i, (sample_number,) in enumerate(ps.iter_unpack('I', min(entry_count, max_rows))):
+		ps.print(f'[sync sample {i:5}] sample_number = {sample_number:6}')
 	if entry_count > max_rows:
+		ps.read((entry_count - max_rows) * 4) # not shown, so no need to decode them
 		ps.print('...')
 
 def parse_sbgp_box(ps: Parser):
@@ -634,13 +634,12 @@ def parse_sbgp_box(ps: Parser):
 	sample = 1
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		sample_count = ps.int(4)
-		group_description_index = ps.int(4)
-		if i < max_rows:
-			ps.print(f'[entry {i+1:5}] [sample = {sample:6}] sample_count = {sample_count:5}, group_description_index = {group_description_index:5}')
+	for i, (sample_count, group_description_index) in enumerate(ps.iter_unpack('II', min(entry_count, max_rows))):
+		ps.print(f'[entry {i+1:5}] [sample = {sample:6}] sample_count = {sample_count:5}, group_description_index = {group_description_index:5}')
 		sample += sample_count
 	if entry_count > max_rows:
+		# not shown, we only need their totals
+		sample += sum(ps.int_array(4, (entry_count - max_rows) * 2)[0::2])
 		ps.print('...')
 	ps.print(f'[samples = {sample-1:6}]')
 
@@ -654,11 +653,11 @@ def parse_saiz_box(ps: Parser):
 	ps.field('default_sample_info_size', default_sample_info_size := ps.int(1))
 	ps.field('sample_count', sample_count := ps.int(4))
 	if default_sample_info_size == 0:
-		for i in range(sample_count):
+		for i in range(min(sample_count, max_rows)):
 			sample_info_size = ps.int(1)
-			if i < max_rows:
-				ps.print(f'[sample {i+1:6}] sample_info_size = {sample_info_size:5}')
+			ps.print(f'[sample {i+1:6}] sample_info_size = {sample_info_size:5}')
 		if sample_count > max_rows:
+			ps.read(sample_count - max_rows) # not shown, so no need to decode them
 			ps.print('...')
 
 def parse_saio_box(ps: Parser):
@@ -671,11 +670,10 @@ def parse_saio_box(ps: Parser):
 
 	entry_count = ps.int(4)
 	ps.field('entry_count', entry_count)
-	for i in range(entry_count):
-		offset = ps.int(wsize)
-		if i < max_rows:
-			ps.print(f'[entry {i+1:6}] offset = {offset:#08x}')
+	for i, (offset,) in enumerate(ps.iter_unpack(['I', 'Q'][version], min(entry_count, max_rows))):
+		ps.print(f'[entry {i+1:6}] offset = {offset:#08x}')
 	if entry_count > max_rows:
+		ps.read((entry_count - max_rows) * wsize) # not shown, so no need to decode them
 		ps.print('...')
 
 def parse_tfdt_box(ps: Parser):
@@ -712,29 +710,48 @@ def parse_trun_box(ps: Parser):
 	if box_flags & (1 << 2):
 		parse_sample_flags(ps, 'first_sample_flags')
 
+	# decode the shown samples at once, with a struct matching the present fields
+	sample_format, sample_size, duration_idx, size_idx, row_format = trun_sample_format(box_flags & 0xf00, version)
+	samples = ps.iter_unpack(sample_format, min(sample_count, max_rows))
+
 	s_offset = 0
 	s_time = 0
-	for s_idx in range(sample_count):
-		s_text = []
-		if box_flags & (1 << 8):
-			sample_duration = ps.int(4)
-			s_text.append(f'time={s_time:7} + {sample_duration:5}')
-			s_time += sample_duration
-		if box_flags & (1 << 9):
-			sample_size = ps.int(4)
-			s_text.append(f'offset={s_offset:#9x} + {sample_size:5}')
-			s_offset += sample_size
-		if box_flags & (1 << 10):
-			sample_flags = ps.int(4)
-			s_text.append(f'flags={sample_flags:08x}') # FIXME: use parse_sample_flags here when we expand this
-		if box_flags & (1 << 11):
-			sample_composition_time_offset = [ps.int, ps.sint][version](4)
-			s_text.append(f'{sample_composition_time_offset}')
-		if s_idx < max_rows:
-			ps.print(f'[sample {s_idx:4}] {", ".join(s_text)}')
+	for s_idx, sample in enumerate(samples):
+		ps.print(row_format.format(s_idx, s_time, s_offset, *sample))
+		if duration_idx is not None:
+			s_time += sample[duration_idx]
+		if size_idx is not None:
+			s_offset += sample[size_idx]
 	if sample_count > max_rows:
+		ps.read((sample_count - max_rows) * sample_size) # not shown, so no need to decode them
 		ps.print('...')
 
+@lru_cache()
+def trun_sample_format(box_flags: int, version: int) -> Tuple[str, int, Optional[int], Optional[int], str]:
+	'''
+	get struct format, size, indices of the duration and size fields (if present) and row format for the samples of a trun with these flags.
+	rows are formatted positionally: sample index, time, offset, then the decoded fields.
+	'''
+	sample_format = ''
+	fields = []
+	duration_idx = size_idx = None
+	if box_flags & (1 << 8):
+		duration_idx = len(sample_format)
+		fields.append('time={1:7} + {%d:5}' % (3 + len(sample_format)))
+		sample_format += 'I'
+	if box_flags & (1 << 9):
+		size_idx = len(sample_format)
+		fields.append('offset={2:#9x} + {%d:5}' % (3 + len(sample_format)))
+		sample_format += 'I'
+	if box_flags & (1 << 10):
+		fields.append('flags={%d:08x}' % (3 + len(sample_format))) # FIXME: use parse_sample_flags here when we expand this
+		sample_format += 'I'
+	if box_flags & (1 << 11):
+		fields.append('{%d}' % (3 + len(sample_format)))
+		sample_format += 'I' if version == 0 else 'i'
+	row_format = '[sample {0:4}] ' + ', '.join(fields)
+	return sample_format, 4 * len(sample_format), duration_idx, size_idx, row_format
+
 # FIXME: describe handlers, boxes (from RA, also look at the 'handlers' and 'unlisted' pages), brands
 
 
@@ -757,9 +774,9 @@ def parse_tenc_box(ps: Parser):
 	ps.reserved('reserved_1', ps.int(1), 0)
 
 	if version > 0:
-		with ps.bits(1) as br:
-			ps.field('default_crypt_byte_block', br.read(4))
-			ps.field('default_skip_byte_block', br.read(4))
+		composite = ps.int(1)
+		ps.field('default_crypt_byte_block', composite >> 4)
+		ps.field('default_skip_byte_block', composite & mask(4))
 	else:
 		ps.reserved('reserved_2', ps.int(1), 0)
 
@@ -779,8 +796,8 @@ def parse_pssh_box(ps: Parser):
 
 	if version > 0:
 		KID_count = ps.int(4)
-		for i in range(KID_count):
-			ps.print(f'- KID: {ps.bytes(16).hex()}')
+		for (KID,) in ps.iter_unpack('16s', KID_count):
+			ps.print(f'- KID: {KID.hex()}')
 
 	ps.field_dump('Data', ps.offset, ps.int(4))
 
@@ -794,14 +811,20 @@ def parse_senc_box(ps: Parser):
 
 	sample_count = ps.int(4)
 	for s_idx in range(sample_count):
+		# samples past max_rows still need to be walked, but not formatted
+		shown = s_idx < max_rows
 		s_text = []
 		if args.senc_per_sample_iv:
-			InitializationVector = ps.bytes(args.senc_per_sample_iv).hex()
-			s_text.append(f'time={InitializationVector}')
+			InitializationVector = ps.read(args.senc_per_sample_iv)
+			if shown: s_text.append(f'time={InitializationVector.hex()}')
 		if box_flags & (1 << 1):
-			subsamples = [ (ps.int(2), ps.int(4)) for _ in range(ps.int(2)) ]
-			s_text.append(f'subsamples={subsamples}')
-		if s_idx < max_rows:
+			subsample_count = ps.int(2)
+			if shown:
+				subsamples = [ (ps.int(2), ps.int(4)) for _ in range(subsample_count) ]
+				s_text.append(f'subsamples={subsamples}')
+			else:
+				ps.read(subsample_count * 6)
+		if shown:
 			ps.print(f'[sample {s_idx:4}] {", ".join(s_text)}')
 	if sample_count > max_rows:
 		ps.print('...')
@@ -888,7 +911,7 @@ def parse_data_box(ps: Parser):
 
 	# data
 	if type_indicator_byte == 0 and type_indicator == 1:
-		ps.field('value', ps.bytes().decode('utf-8'))
+		ps.field('value', str(ps.read(), 'utf-8'))
 	else:
 		ps.field_dump('value')
 
@@ -934,11 +957,11 @@ def parse_chpl_box(ps: Parser):
 		# > timescale and timeline of the F4V file
 		timestamp = ps.int(8)
 		title_size = ps.int(1)
-		title_bytes = ps.bytes(title_size)
-		# The F4V spec makes no mention of character encoding.
-		# VLC seems to assume UTF-8, so I'll go with that.
-		title_str = title_bytes.decode("utf-8", "replace")
+		title_bytes = ps.read(title_size)
 		if i < max_rows:
+			# The F4V spec makes no mention of character encoding.
+			# VLC seems to assume UTF-8, so I'll go with that.
+			title_str = str(title_bytes, "utf-8", "replace")
 			ps.print(f'[entry {i+1:3}] time={timestamp:12} {title_str!r}')
 	if entry_count > max_rows:
 		ps.print('...')
@@ -4,7 +4,7 @@ MPEG-4 part 1 DESCRIPTORS (based on 2010 edition)
 they're still part of MPEG-4 and not widely known so we'll make an exception)
 '''
 
-import re
+from functools import lru_cache
 from typing import Iterable, TypeVar, Tuple, Dict
 
 from mp4parser import \
@@ -39,41 +39,38 @@ def parse_descriptor(ps: Parser, expected=None, namespace='default', contents_fn
 	size_start = ps.offset
 	size = 0
 	while True:
-		with ps.bits(1) as br:
-			next_byte = br.bit()
-			size = (size << 7) | br.read(7)
-		if not next_byte: break
+		size_byte = ps.int(1)
+		size = (size << 7) | (size_byte & mask(7))
+		if not size_byte >> 7: break
 
 	n_size_bytes = ps.offset - size_start
 	size_text = ''
 	if size.bit_length() <= (n_size_bytes - 1) * 7:
 		size_text = ansi_fg4(f' ({n_size_bytes} length bytes)')
 
-	def get_class_chain(k):
-		r = [k]
-		while k['base_class'] != None:
-			k = class_registry[k['base_class']][1]
-			r.append(k)
-		return r
+	klasses, labels = tag_tables[namespace][tag]
+	ps.print(ansi_bold(f'[{tag}]') + (' ' + labels if show_descriptions else '') + size_text, header=True)
+	with ps.subparser(size) as data, data.handle_errors():
+		(contents_fn or parse_descriptor_contents)(tag, klasses, data)
+
+def describe_tag(namespace: str, tag: int):
+	''' get the class chain for a tag (most derived first) and its label '''
 	nsdata = descriptor_namespaces[namespace]
-	labels = []
-	klasses = []
 	if tag in nsdata['tag_registry']:
-		klasses = get_class_chain(nsdata['tag_registry'][tag])
-	else:
-		labels.append(ansi_fg4('reserved for ISO use' if tag < nsdata['user_private'] else 'user private'))
-		if k := next((k for (s, e, k) in nsdata['ranges'] if s <= tag < e), None):
-			klasses = get_class_chain(class_registry[k][1])
-	labels += [ ansi_bold(k['name']) for k in klasses ]
+		k = nsdata['tag_registry'][tag]
+		return k['chain'], k['chain_label']
+	label = reserved_label if tag < nsdata.get('user_private', 0x100) else user_private_label
+	if k := next((k for (s, e, k) in nsdata.get('ranges', []) if s <= tag < e), None):
+		k = class_registry[k][1]
+		return k['chain'], label + ' -> ' + k['chain_label']
+	return (), label
 
-	ps.print(ansi_bold(f'[{tag}]') + (' ' + ' -> '.join(labels) if show_descriptions else '') + size_text, header=True)
-	with ps.subparser(size) as data, data.handle_errors():
-		(contents_fn or parse_descriptor_contents)(tag, klasses, data)
+reserved_label = ansi_fg4('reserved for ISO use')
+user_private_label = ansi_fg4('user private')
 
 def parse_descriptor_contents(tag: int, klasses, ps: Parser):
-	for k in klasses[::-1]:
-		if 'handler' not in k: break
-		k['handler'](ps)
+	for handler in (klasses[0]['handlers'] if klasses else ()):
+		handler(ps)
 	if (data := ps.read()) and max_dump:
 		print_hex_dump(data, ps.prefix)
 
@@ -97,30 +94,31 @@ def parse_IP_IdentificationDataSet_descriptor(ps: Parser):
 
 def parse_ES_Descriptor_descriptor(ps: Parser):
 	ps.field('ES_ID', ps.int(2))
-	with ps.bits(1) as br:
-		streamDependenceFlag = br.bit()
-		URL_Flag = br.bit()
-		OCRstreamFlag = br.bit()
-		ps.field('streamPriority', br.read(5))
+	composite_1 = ps.int(1)
+	streamDependenceFlag = composite_1 >> 7
+	URL_Flag = (composite_1 >> 6) & 1
+	OCRstreamFlag = (composite_1 >> 5) & 1
+	ps.field('streamPriority', composite_1 & mask(5))
 	if streamDependenceFlag:
 		ps.field('dependsOn_ES_ID', ps.int(2))
 	if URL_Flag:
-		ps.field('URL', ps.bytes(ps.int(1)).decode('utf-8'))
+		ps.field('URL', str(ps.read(ps.int(1)), 'utf-8'))
 	if OCRstreamFlag:
 		ps.field('OCR_ES_ID', ps.int(2))
 	parse_descriptors(ps)
 
 def parse_DecoderConfigDescriptor_descriptor(ps: Parser):
 	ps.field('objectTypeIndication', ps.int(1), describe=format_object_type)
-	with ps.bits(4) as br:
-		ps.field('streamType', br.read(6), describe=format_stream_type)
-		ps.field('upStream', br.bit())
-		ps.reserved('reserved', br.read(1), 1)
-		ps.field('bufferSizeDB', br.read(24))
+	composite = ps.int(4)
+	ps.field('streamType', composite >> 26, describe=format_stream_type)
+	ps.field('upStream', bool(composite & (1 << 25)))
+	ps.reserved('reserved', (composite >> 24) & 1, 1)
+	ps.field('bufferSizeDB', composite & mask(24))
 	ps.field('maxBitrate', ps.int(4))
 	ps.field('avgBitrate', ps.int(4))
 	parse_descriptors(ps)
 
+@lru_cache(maxsize=256)
 def format_sl_predefined(predefined: int) -> str:
 	return {
 		0x00: 'Custom',
@@ -132,15 +130,15 @@ def parse_SLConfigDescriptor_descriptor(ps: Parser):
 	ps.field('predefined', predefined := ps.int(1), describe=format_sl_predefined)
 	if predefined != 0: return
 
-	with ps.bits(1) as br:
-		ps.field('useAccessUnitStartFlag', br.bit())
-		ps.field('useAccessUnitEndFlag', br.bit())
-		ps.field('useRandomAccessPointFlag', br.bit())
-		ps.field('hasRandomAccessUnitsOnlyFlag', br.bit())
-		ps.field('usePaddingFlag', br.bit())
-		ps.field('useTimeStampsFlag', useTimeStampsFlag := br.bit())
-		ps.field('useIdleFlag', br.bit())
-		ps.field('durationFlag', durationFlag := br.bit())
+	flags = ps.int(1)
+	ps.field('useAccessUnitStartFlag', bool(flags & (1 << 7)))
+	ps.field('useAccessUnitEndFlag', bool(flags & (1 << 6)))
+	ps.field('useRandomAccessPointFlag', bool(flags & (1 << 5)))
+	ps.field('hasRandomAccessUnitsOnlyFlag', bool(flags & (1 << 4)))
+	ps.field('usePaddingFlag', bool(flags & (1 << 3)))
+	ps.field('useTimeStampsFlag', useTimeStampsFlag := bool(flags & (1 << 2)))
+	ps.field('useIdleFlag', bool(flags & (1 << 1)))
+	ps.field('durationFlag', durationFlag := bool(flags & (1 << 0)))
 	ps.field('timeStampResolution', ps.int(4))
 	ps.field('OCRResolution', ps.int(4))
 	ps.field('timeStampLength', timeStampLength := ps.int(1))
@@ -150,13 +148,13 @@ def parse_SLConfigDescriptor_descriptor(ps: Parser):
 	ps.field('AU_Length', AU_Length := ps.int(1))
 	assert AU_Length <= 32, f'invalid AU_Length: {AU_Length}'
 	ps.field('instantBitrateLength', ps.int(1))
-	with ps.bits(2) as br:
-		ps.field('degradationPriorityLength', br.read(4))
-		ps.field('AU_seqNumLength', AU_seqNumLength := br.read(5))
-		assert AU_seqNumLength <= 16, f'invalid AU_seqNumLength: {AU_seqNumLength}'
-		ps.field('packetSeqNumLength', packetSeqNumLength := br.read(5))
-		assert packetSeqNumLength <= 16, f'invalid packetSeqNumLength: {packetSeqNumLength}'
-		ps.reserved('reserved', br.read(2), 0b11)
+	composite = ps.int(2)
+	ps.field('degradationPriorityLength', composite >> 12)
+	ps.field('AU_seqNumLength', AU_seqNumLength := (composite >> 7) & mask(5))
+	assert AU_seqNumLength <= 16, f'invalid AU_seqNumLength: {AU_seqNumLength}'
+	ps.field('packetSeqNumLength', packetSeqNumLength := (composite >> 2) & mask(5))
+	assert packetSeqNumLength <= 16, f'invalid packetSeqNumLength: {packetSeqNumLength}'
+	ps.reserved('reserved', composite & mask(2), 0b11)
 	if durationFlag:
 		ps.field('timeScale', ps.int(4))
 		ps.field('accessUnitDuration', ps.int(2))
@@ -175,6 +173,7 @@ def parse_ES_ID_Ref_descriptor(ps: Parser):
 def parse_ExtendedSLConfigDescriptor_descriptor(ps: Parser):
 	parse_descriptors(ps)
 
+@lru_cache(maxsize=256)
 def format_qos_predefined(predefined: int) -> str:
 	return {
 		0x00: 'Custom',
@@ -192,13 +191,13 @@ def parse_BaseCommand_descriptor(ps: Parser):
 	pass
 
 def parse_InitialObjectDescriptor_descriptor(ps: Parser):
-	with ps.bits(2) as br:
-		ps.field('ObjectDescriptorID', br.read(10))
-		URL_Flag = br.bit()
-		ps.field('includeInlineProfileLevelFlag', br.bit())
-		ps.reserved('reserved', br.read(4), mask(4))
+	composite = ps.int(2)
+	ps.field('ObjectDescriptorID', composite >> 6)
+	URL_Flag = bool(composite & (1 << 5))
+	ps.field('includeInlineProfileLevelFlag', bool(composite & (1 << 4)))
+	ps.reserved('reserved', composite & mask(4), mask(4))
 	if URL_Flag:
-		ps.field('URLstring', ps.bytes(ps.int(1)).decode('utf-8'))
+		ps.field('URLstring', str(ps.read(ps.int(1)), 'utf-8'))
 	else:
 		ps.field('ODProfileLevelIndication', ps.int(1))
 		ps.field('sceneProfileLevelIndication', ps.int(1))
@@ -215,6 +214,8 @@ def parse_InitialObjectDescriptor_descriptor(ps: Parser):
 
 # METADATA
 
+tag_tables = {}
+
 def init_descriptors():
 	global class_registry
 	# do sanity checks on the data defined above. for every namespace, make sure:
@@ -227,25 +228,46 @@ def init_descriptors():
 		ns['tag_registry'] = unique_dict(( k['tag'], k ) for k in ns['classes'] if 'tag' in k)
 		#  - range class names are valid
 		assert all(class_registry.get(klname, (None,))[0] == nsname for (_, _, klname) in ns.get('ranges', [])), f'namespace {nsname} has invalid ranges'
-		#  - base classes are valid, and there are no cycles
+		#  - base classes are valid (cycles are caught below, when building the chains)
 		for k in ns['classes']:
-			while k['base_class'] != None:
-				assert class_registry.get(k['base_class'], (None,))[0] == nsname, f'class {k["base_class"]} not defined'
-				k = class_registry[k['base_class']][1]
+			assert k['base_class'] == None or class_registry.get(k['base_class'], (None,))[0] == nsname, f'class {k["base_class"]} not defined'
+
+	# link base classes directly, and format class names once (they're used in the labels of every tag)
+	for (_, k) in class_registry.values():
+		k['base'] = class_registry[k['base_class']][1] if k['base_class'] != None else None
+		k['bold_name'] = ansi_bold(k['name'])
+
+	# build the class chain (most derived first) of every class, and its label
+	for (_, k) in class_registry.values():
+		chain, base = [k], k
+		while (base := base['base']) != None:
+			chain.append(base)
+			assert len(chain) <= len(class_registry), f'class {k["name"]} has a cycle in its bases'
+		k['chain'] = tuple(chain)
+		k['chain_label'] = ' -> '.join(base['bold_name'] for base in chain)
 
 	# register handlers defined above
 	for k, v in globals().items():
-		if m := re.fullmatch(r'parse_(.+)_descriptor', k):
-			k = m.group(1)
+		# (parse_descriptor itself matches both ends, but leaves an empty name)
+		if k.startswith('parse_') and k.endswith('_descriptor') and (k := k[len('parse_'):-len('_descriptor')]):
 			assert k in class_registry, f'descriptor {k} not defined'
 			class_registry[k][1]['handler'] = v
 
-	# check base classes of defined handlers also have a defined handler
+	# collect the handlers to call for each class (base first, up to the first class without one),
+	# and check base classes of defined handlers also have a defined handler
+	# (checking the direct base is enough, since that one is checked too)
 	for (_, k) in class_registry.values():
-		if 'handler' in k:
-			while k['base_class'] != None:
-				k = class_registry[k['base_class']][1]
-				assert 'handler' in k
+		if 'handler' in k and (base := k['base']) != None:
+			assert 'handler' in base, f'descriptor {base["name"]} needs a handler, as {k["name"]} has one'
+		handlers = []
+		for base in reversed(k['chain']):
+			if 'handler' not in base: break
+			handlers.append(base['handler'])
+		k['handlers'] = tuple(handlers)
+
+	# resolve every possible tag upfront, so that parsing only needs to index a table
+	for nsname in descriptor_namespaces:
+		tag_tables[nsname] = [ describe_tag(nsname, tag) for tag in range(0x100) ]
 
 init_descriptors()
 
@@ -267,6 +289,7 @@ init_descriptors()
 
 # FIXME: Implements AFXExtDescriptor, which has its own namespace
 
+@lru_cache(maxsize=256)
 def format_object_type(oti: int) -> str:
 	assert 0 <= oti < 0x100
 	if oti == 0x00:
@@ -281,6 +304,7 @@ def format_object_type(oti: int) -> str:
 	else:
 		return ansi_fg4('reserved for ISO use' if oti < 0xC0 else 'user private')
 
+@lru_cache(maxsize=64)
 def format_stream_type(sti: int) -> str:
 	assert 0 <= sti < 0x40
 	if sti == 0x00:
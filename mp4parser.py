@@ -5,14 +5,17 @@ Core parsing logic
 
 import sys
 import mmap
+import struct
 import itertools
+from array import array
 from datetime import datetime, timezone
 
 import options
 import boxes
 from parser_tables import box_registry
 from contextlib import contextmanager
-from typing import Optional, Union, Callable, TypeVar, Iterable, List, Tuple
+from functools import lru_cache
+from typing import Any, Optional, Union, Callable, TypeVar, Iterator, List, Tuple
 T = TypeVar('T')
 
 args = options.parser.parse_args()
@@ -20,17 +23,21 @@ fname = args.filename
 
 mp4file = open(fname, 'rb')
 mp4map = mmap.mmap(mp4file.fileno(), 0, prot=mmap.PROT_READ)
+if hasattr(mmap, 'MADV_SEQUENTIAL'):
+	# we mostly walk the file forward, let the kernel read ahead
+	mp4map.madvise(mmap.MADV_SEQUENTIAL)
 mp4mem = memoryview(mp4map)
 
 # FIXME: move this to dataclass, put in options.py
 indent_n = args.indent
 bytes_per_line = args.bytes_per_line
-max_rows = args.rows
+max_rows = max(args.rows, 0) # negative values show nothing, like 0
 max_dump = bytes_per_line * max_rows
 show_lengths = args.lengths
 show_offsets = args.offsets
 show_defaults = args.defaults
 show_descriptions = args.descriptions
+show_nalu_data = args.nalu_data
 colorize = sys.stdout.buffer.isatty() \
 	if args.color == None else args.color
 
@@ -48,7 +55,8 @@ class BitReader:
 	''' MSB-first bit reader '''
 
 	def __init__(self, buffer: memoryview) -> None:
-		self.buffer = memoryview(buffer).cast('B')
+		# bit fields are short, and bytes are faster to index and slice than memoryviews
+		self.buffer = bytes(buffer)
 		self.pos = 0
 
 	@property
@@ -57,20 +65,25 @@ class BitReader:
 
 	@property
 	def ended(self) -> bool:
-		return self.remaining == 0
+		return self.pos == len(self.buffer) * 8
 
 	def read(self, n = -1) -> int:
 		n = n if n >= 0 else self.remaining
-		res = 0
-		for _ in range(n):
-			res <<= 1
-			p, b = divmod(self.pos, 8)
-			res |= (self.buffer[p] >> (7 - b)) & 1
-			self.pos += 1
-		return res
+		if n > self.remaining:
+			raise EOFError(f'unexpected EOF (needed {n} bits, got {self.remaining})')
+		# decode the bytes covering the requested bits at once, then drop the surrounding bits
+		start, end = self.pos, self.pos + n
+		p0, p1 = start >> 3, (end + 7) >> 3
+		res = int.from_bytes(self.buffer[p0:p1], 'big') >> ((p1 << 3) - end)
+		self.pos = end
+		return res & mask(n)
 
 	def bit(self) -> bool:
-		return bool(self.read(1))
+		if self.pos == len(self.buffer) * 8:
+			raise EOFError('unexpected EOF (needed 1 bits, got 0)')
+		res = (self.buffer[self.pos >> 3] >> (7 - (self.pos & 7))) & 1
+		self.pos += 1
+		return bool(res)
 
 	# support for 'with' (checks all data is consumed)
 
@@ -78,8 +91,13 @@ class BitReader:
 		return self
 
 	def __exit__(self, exc_type, exc_value, traceback):
-		if exc_type == None and (remaining := self.remaining):
-			raise AssertionError(f'{remaining} unparsed trailing bits')
+		if exc_type == None and self.pos != len(self.buffer) * 8:
+			raise AssertionError(f'{self.remaining} unparsed trailing bits')
+
+uint_unpackers = { n: struct.Struct('>' + c).unpack_from for n, c in [(1, 'B'), (2, 'H'), (4, 'I'), (8, 'Q')] }
+sint_unpackers = { n: struct.Struct('>' + c).unpack_from for n, c in [(1, 'b'), (2, 'h'), (4, 'i'), (8, 'q')] }
+# `array` typecodes have platform-dependent sizes, so pick them by itemsize
+uint_typecodes = { array(c).itemsize: c for c in 'QLIHB' }
 
 class MVIO:
 	''' like BytesIO, but returns memoryviews instead of bytes. it also contains higher-level methods '''
@@ -99,12 +117,12 @@ class MVIO:
 	@property
 	def ended(self) -> bool:
 		assert not self.locked
-		return self.remaining == 0
+		return self.pos == len(self.buffer)
 
 	def peek(self, n = -1) -> memoryview:
 		assert not self.locked
 		n = n if n >= 0 else self.remaining
-		res = self.buffer[self.pos:][:n]
+		res = self.buffer[self.pos:self.pos + n]
 		if len(res) != n:
 			raise EOFError(f'unexpected EOF (needed {n}, got {len(res)})')
 		return res
@@ -129,18 +147,77 @@ class MVIO:
 	def bytes(self, n = -1) -> bytes:
 		return self.read(n).tobytes()
 
+	def int_array(self, size: int, n: int) -> 'array[int]':
+		''' read n big-endian unsigned integers of `size` bytes at once '''
+		res = array(uint_typecodes[size])
+		assert res.itemsize == size
+		res.frombytes(self.read(n * size))
+		if sys.byteorder == 'little':
+			res.byteswap()
+		return res
+
+	def unpack(self, fmt: str) -> Tuple[Any, ...]:
+		''' read a big-endian structure in one go (see the `struct` module) '''
+		fmt = '>' + fmt
+		return struct.unpack(fmt, self.read(struct.calcsize(fmt)))
+
+	def iter_unpack(self, fmt: str, n: int) -> Iterator[Tuple[Any, ...]]:
+		'''
+		read n consecutive big-endian structures, decoding them as they're iterated.
+		if the data ends early, the complete ones are still yielded before raising EOFError.
+		'''
+		fmt = '>' + fmt
+		size = struct.calcsize(fmt)
+		if not size:
+			return itertools.repeat((), n)
+		complete = min(n, self.remaining // size)
+		records = struct.iter_unpack(fmt, self.read(complete * size))
+		if complete == n:
+			return records
+		missing = f'unexpected EOF (needed {size}, got {self.remaining})'
+		def truncated():
+			yield from records
+			raise EOFError(missing)
+		return truncated()
+
+	# int / sint are by far the most called, so they skip read() and
+	# use struct for the usual widths (no intermediate memoryview)
+
 	def sint(self, n: int) -> int:
-		return int.from_bytes(self.read(n), 'big', signed=True)
+		assert not self.locked
+		if (got := len(self.buffer) - self.pos) < n:
+			raise EOFError(f'unexpected EOF (needed {n}, got {got})')
+		if (unpack := sint_unpackers.get(n)):
+			res, = unpack(self.buffer, self.pos)
+		else:
+			res = int.from_bytes(self.buffer[self.pos:self.pos + n], 'big', signed=True)
+		self.pos += n
+		return res
 
 	def int(self, n: int) -> int:
-		return int.from_bytes(self.read(n), 'big')
+		assert not self.locked
+		if (got := len(self.buffer) - self.pos) < n:
+			raise EOFError(f'unexpected EOF (needed {n}, got {got})')
+		if (unpack := uint_unpackers.get(n)):
+			res, = unpack(self.buffer, self.pos)
+		else:
+			res = int.from_bytes(self.buffer[self.pos:self.pos + n], 'big')
+		self.pos += n
+		return res
 
 	def string(self, encoding='utf-8') -> str:
 		data = self.peek()
-		if (size := data.tobytes().find(b'\0')) == -1:
-			raise EOFError('EOF while reading string')
+		# look for the terminator in growing chunks, so that short strings
+		# don't need a copy of the whole remaining buffer
+		start, chunk = 0, 64
+		while (size := data[start:start + chunk].tobytes().find(b'\0')) == -1:
+			start += chunk
+			chunk *= 2
+			if start >= len(data):
+				raise EOFError('EOF while reading string')
+		size += start
 		self.pos += size + 1
-		return data[:size].tobytes().decode(encoding)
+		return str(data[:size], encoding)
 
 	@contextmanager
 	def bits(self, n = -1):
@@ -150,7 +227,7 @@ class MVIO:
 	# less common primitives
 
 	def fourcc(self) -> str:
-		return self.read(4).tobytes().decode('latin-1')
+		return str(self.read(4), 'latin-1')
 
 	def uuid(self) -> str:
 		return format_uuid(self.bytes(16))
@@ -170,12 +247,16 @@ class MVIO:
 
 	def __exit__(self, exc_type, exc_value, traceback):
 		assert not self.locked, 'stream was left locked(?)'
-		if exc_type == None and (remaining := self.remaining):
-			raise AssertionError(f'{remaining} unparsed trailing bytes')
+		if exc_type == None and self.pos != len(self.buffer):
+			raise AssertionError(f'{self.remaining} unparsed trailing bytes')
 
 
 # PARSER STATE
 
+@lru_cache(maxsize=64)
+def indent_prefix(indent: int) -> str:
+	return ' ' * (indent * indent_n)
+
 class Parser(MVIO):
 	''' subclass of MVIO that holds the rest of the parsing state '''
 
@@ -183,7 +264,7 @@ class Parser(MVIO):
 		super().__init__(buffer)
 		self.start = start
 		self.indent = indent
-		self.prefix = ' ' * (self.indent * indent_n)
+		self.prefix = indent_prefix(self.indent)
 
 	@property
 	def offset(self) -> int:
@@ -193,7 +274,7 @@ class Parser(MVIO):
 		prefix = self.prefix
 		if header:
 			assert self.indent > 0
-			prefix = ' ' * ((self.indent - 1) * indent_n)
+			prefix = indent_prefix(self.indent - 1)
 		print(prefix + val)
 
 	def raw_field(self, name: str, value: str):
@@ -247,12 +328,12 @@ class Parser(MVIO):
 	@contextmanager
 	def in_object(self):
 		self.indent += 1
-		self.prefix = ' ' * (self.indent * indent_n)
+		self.prefix = indent_prefix(self.indent)
 		try:
 			yield self
 		finally:
 			self.indent -= 1
-			self.prefix = ' ' * (self.indent * indent_n)
+			self.prefix = indent_prefix(self.indent)
 
 	@contextmanager
 	def in_list(self):
@@ -268,16 +349,6 @@ class Parser(MVIO):
 
 # FORMATTING
 
-def pad_iter(iterable: Iterable[T], size: int, default: T=None) -> Iterable[Optional[T]]:
-	iterator = iter(iterable)
-	for _ in range(size):
-		yield next(iterator, default)
-
-def split_in_groups(iterable: Iterable[T], size: int) -> Iterable[List[T]]:
-	iterator = iter(iterable)
-	while (group := list(itertools.islice(iterator, size))):
-		yield group
-
 def ansi_sgr(p: str, content: str):
 	content = str(content)
 	if not colorize: return content
@@ -294,32 +365,52 @@ ansi_fg4 = lambda x: ansi_sgr('34', x)
 ansi_fg5 = lambda x: ansi_sgr('35', x)
 ansi_fg6 = lambda x: ansi_sgr('36', x)
 ansi_fg7 = lambda x: ansi_sgr('37', x)
+if not colorize:
+	# plain output, skip ansi_sgr entirely
+	ansi_bold = ansi_dim = ansi_fg0 = ansi_fg1 = ansi_fg2 = ansi_fg3 = ansi_fg4 = ansi_fg5 = ansi_fg6 = ansi_fg7 = str
 
-def print_hex_dump(data: memoryview, prefix: str):
-	colorize_byte = lambda x, r: \
-		ansi_dim(ansi_fg2(x)) if r == 0 else \
+def colorize_byte(x: str, r: int) -> str:
+	return ansi_dim(ansi_fg2(x)) if r == 0 else \
 		ansi_fg3(x) if chr(r).isascii() and chr(r).isprintable() else \
 		ansi_fg2(x)
-	format_hex = lambda x: colorize_byte(f'{x:02x}', x) if x != None else '  '
-	format_char = lambda x: colorize_byte(x if x.isascii() and (x.isprintable() or x == ' ') else '.', ord(x))
+# formatted hex / char cells of every byte value, for hex dumps
+hex_cells = [ colorize_byte(f'{r:02x}', r) for r in range(0x100) ]
+char_cells = [ colorize_byte(chr(r) if chr(r).isascii() and chr(r).isprintable() else '.', r) for r in range(0x100) ]
+# same chars, as a translation table (for uncolored output)
+char_table = bytes(r if chr(r).isascii() and chr(r).isprintable() else ord('.') for r in range(0x100))
 
-	def format_line(line):
-		groups = split_in_groups(pad_iter(line, bytes_per_line), 4)
-		hex_part = '  '.join(' '.join(map(format_hex, group)) for group in groups)
-		char_part = ''.join(format_char(x) for x in map(chr, line))
+def print_hex_dump(data: memoryview, prefix: str):
+	def format_line(line: memoryview):
+		cells = [ hex_cells[x] for x in line ] + [ '  ' ] * (bytes_per_line - len(line))
+		hex_part = '  '.join(' '.join(cells[i:i+4]) for i in range(0, bytes_per_line, 4))
+		char_part = ''.join(char_cells[x] for x in line)
 		return hex_part + '   ' + char_part
 
-	for line in split_in_groups(data[:max_dump], bytes_per_line):
-		print(prefix + format_line(line))
+	hex_width = bytes_per_line * 3 - 1 + (bytes_per_line - 1) // 4
+	def format_line_plain(line: memoryview):
+		hex_part = '  '.join(line[i:i+4].hex(' ') for i in range(0, len(line), 4))
+		char_part = line.tobytes().translate(char_table).decode('ascii')
+		return hex_part.ljust(hex_width) + '   ' + char_part
+
+	if not colorize:
+		format_line = format_line_plain
+
+	data = memoryview(data).cast('B')
+	lines = []
+	if max_dump: # also guards against --bytes-per-line 0
+		lines = [ prefix + format_line(data[i:i+bytes_per_line]) for i in range(0, min(len(data), max_dump), bytes_per_line) ]
 	if len(data) > max_dump:
-		print(prefix + '...')
+		lines.append(prefix + '...')
+	if lines:
+		print('\n'.join(lines))
 
 def print_error(exc, prefix: str):
 	print(prefix + f'{ansi_bold(ansi_fg1("ERROR:"))} {ansi_fg1(exc)}\n')
 
 def format_uuid(x: bytes) -> str:
-	with MVIO(memoryview(x)) as r:
-		return '-'.join(r.bytes(i).hex() for i in [4, 2, 2, 2, 6])
+	assert len(x) == 16
+	h = x.hex()
+	return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
 
 def format_fraction(x: Tuple[int, int]):
 	assert type(x) is tuple and len(x) == 2 and all(type(i) is int for i in x)
@@ -331,16 +422,18 @@ def format_size(x: Union[Tuple[int, int], Tuple[float, float]]):
 	width, height = x
 	return f'{width} × {height}'
 
+@lru_cache(maxsize=256)
 def format_time(x: int) -> str:
 	ts = datetime.fromtimestamp(x - 2082844800, timezone.utc)
 	return ts.isoformat(' ', 'seconds').replace('+00:00', 'Z')
 
 def decode_language(data: bytes) -> Optional[str]:
 	''' decode a (2-byte) packed ISO 639-2/T code '''
-	with BitReader(memoryview(data)) as br:
-		pad = br.read(1)
-		assert not pad, f'invalid language pad {pad}'
-		syms = [br.read(5) for _ in range(3)]
+	assert len(data) == 2
+	packed = int.from_bytes(data, 'big')
+	pad = packed >> 15
+	assert not pad, f'invalid language pad {pad}'
+	syms = [(packed >> 10) & mask(5), (packed >> 5) & mask(5), packed & mask(5)]
 	assert all(0 <= (x - 1) < 26 for x in syms), f'invalid language characters: {syms}'
 	return ''.join(chr((x - 1) + ord('a')) for x in syms)
 
@@ -360,7 +453,7 @@ init_boxes()
 def parse_box_header(ps: Parser):
 	start = ps.pos
 	length = ps.int(4)
-	btype = ps.fourcc()
+	btype = sys.intern(ps.fourcc())
 	assert btype.isprintable(), f'invalid type {repr(btype)}'
 
 	last_box, large_size = False, False
@@ -390,11 +483,7 @@ def parse_box(ps: Parser, contents_fn: Callable[[str, Parser], T]) -> T:
 	btype, length, last_box, large_size = parse_box_header(ps)
 	offset_text = ansi_fg4(f' @ {offset:#x}, {ps.offset:#x} .. {ps.offset + length:#x}') if show_offsets else ''
 	length_text = ansi_fg4(f' ({length})') if show_lengths else ''
-	name_text = ''
-	if show_descriptions and (box_desc := info_by_box.get(btype)):
-		desc = box_desc[1]
-		if desc.endswith('Box'): desc = desc[:-3]
-		name_text = ansi_bold(f' {desc}')
+	name_text = format_box_name(btype) if show_descriptions else ''
 	if last_box:
 		offset_text = ' (last)' + offset_text
 	if large_size:
@@ -406,21 +495,36 @@ def parse_box(ps: Parser, contents_fn: Callable[[str, Parser], T]) -> T:
 	with ps.subparser(length) as data, data.handle_errors():
 		return contents_fn(btype, data)
 
+@lru_cache(maxsize=None)
+def format_box_name(btype: str) -> str:
+	if not (box_desc := info_by_box.get(btype)):
+		return ''
+	desc = box_desc[1]
+	if desc.endswith('Box'): desc = desc[:-3]
+	return ansi_bold(f' {desc}')
+
 nesting_boxes = { 'moov', 'trak', 'mdia', 'minf', 'dinf', 'stbl', 'mvex', 'moof', 'traf', 'mfra', 'meco', 'edts', 'udta', 'sinf', 'schi', 'gmhd' }
 # metadata?
 nesting_boxes |= { 'aART', 'trkn', 'covr', '----' }
 
-def parse_contents(btype: str, ps: Parser):
+@lru_cache(maxsize=None)
+def get_box_handler(btype: str) -> Optional[Callable[[Parser], Any]]:
+	# resolved on first use rather than at import, since boxes imports us
 	if (handler := getattr(boxes, f'parse_{btype}_box', None)):
-		return handler(ps)
+		return handler
 	if btype in nesting_boxes:
-		return parse_boxes(ps)
+		return parse_boxes
+	return None
+
+def parse_contents(btype: str, ps: Parser):
+	if (handler := get_box_handler(btype)):
+		return handler(ps)
 	if (data := ps.read()) and max_dump:
 		print_hex_dump(data, ps.prefix)
 
 def parse_fullbox(ps: Parser, max_version=0, known_flags=0, default_version=0, default_flags=0):
-	version = ps.int(1)
-	flags = ps.int(3)
+	header = ps.int(4)
+	version, flags = header >> 24, header & mask(24)
 	assert version <= max_version, f'unsupported box version {version}'
 	fields = [
 		('version', version, default_version, str),
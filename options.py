@@ -60,6 +60,9 @@ parser.add_argument('--indent',
 parser.add_argument('--bytes-per-line',
 	type=int, default=16, metavar='N',
 	help='Bytes per line in hexdumps')
+parser.add_argument('--nalu-data',
+	action=BooleanOptionalAction, default=True,
+	help='Show contents of NAL units in codec configuration boxes')
 
 boxargs = parser.add_argument_group('box-specific parsing parameters',
 	'Though very uncommon, parsing of some boxes may be dependent '